@@ -1,14 +1,225 @@
 import streamlit as st
-import json
+import orjson
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import os
+import hashlib
+import html
+import sqlite3
+import zlib
+import re
+import atexit
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
 st.set_page_config(layout="wide", page_title="Product Launch Governance Prototype", page_icon="🚀")
 
 # --- CONFIGURATION ---
 # User requested specific model slug
 MODEL_SLUG = "anthropic/claude-4.5-sonnet"
+TEMPERATURE = 0.1
+# Output caps. The scan emits one checklist entry per rule, so its cap grows with
+# the constitution (~300 tokens of fixed fields + ~75 per rule); the council is ~400.
+SCAN_BASE_TOKENS = 300
+SCAN_TOKENS_PER_RULE = 75
+COUNCIL_MAX_TOKENS = 800
+# Sent on every OpenRouter call; attached once to the pooled session
+_STATIC_HEADERS = {
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://launch-governance-prototype.streamlit.app/",
+    "X-Title": "Launch Governance Prototype"
+}
+DB_PATH = "constitution.db"
+# PRDs estimated above this many tokens are sent to the model as an extractive summary
+PRD_TOKEN_BUDGET = 2000
+
+# --- PROMPTS ---
+# Kept as module constants so every request sends a byte-identical prefix,
+# a precondition for Anthropic's prompt cache (see the note in _post_chat).
+SCANNER_INSTRUCTIONS = """
+You are the Anthropic Governance Engine. 
+Compare the Input PRD against the Strict Governance Rules provided below.
+
+Task:
+1. Check if any existing rules are triggered.
+2. DETECT NOVEL RISKS: Look for risks that are NOT covered by existing rules (e.g., 3rd party data sharing, biometrics, etc).
+3. Assign an 'ambiguity_score' (1-10). 10 = Highly risky/novel with NO matching rule.
+
+Output strictly valid JSON:
+{
+    "checklist": [
+        { "rule_id": "RULE-XXX", "triggered": true, "reason": "Explanation" }
+    ],
+    "ambiguity_score": int,
+    "ambiguity_reason": "Explanation of the novel risk",
+    "risk_level": "Low" | "Medium" | "High"
+}
+"""
+
+COUNCIL_INSTRUCTIONS = """
+You are a Synthetic Stakeholder Council (Safety, Legal, Security).
+The user is proposing a feature with a NOVEL RISK that is not in our Constitution.
+
+1. Analyze the risk.
+2. PROPOSE A NEW PERMANENT RULE for the Constitution to handle this in the future,
+   with 3-8 short trigger keywords/phrases a future PRD would literally contain.
+
+Output JSON:
+{
+    "safety_opinion": "text",
+    "legal_opinion": "text",
+    "proposed_new_rule": {
+        "concept": "Short Name (e.g. 3rd Party Data)",
+        "action": "The required process (e.g. Vendor Security Review)",
+        "owner": "Team Name",
+        "keywords": ["phrase a PRD would contain", "..."]
+    }
+}
+"""
+
+COMBINED_INSTRUCTIONS = """
+You are the Anthropic Governance Engine and, when needed, a Synthetic Stakeholder Council (Safety, Legal, Security).
+Compare the Input PRD against the Strict Governance Rules provided below.
+
+Task:
+1. SCAN: Check if any existing rules are triggered, detect NOVEL RISKS not covered by existing rules,
+   and assign an 'ambiguity_score' (1-10). 10 = Highly risky/novel with NO matching rule.
+2. COUNCIL: Only if ambiguity_score > 6, analyze the novel risk and PROPOSE A NEW PERMANENT RULE
+   for the Constitution, with 3-8 short trigger keywords/phrases a future PRD would literally
+   contain. Otherwise "council" must be null.
+
+Output strictly valid JSON:
+{
+    "scan": {
+        "checklist": [
+            { "rule_id": "RULE-XXX", "triggered": true, "reason": "Explanation" }
+        ],
+        "ambiguity_score": int,
+        "ambiguity_reason": "Explanation of the novel risk",
+        "risk_level": "Low" | "Medium" | "High"
+    },
+    "council": null | {
+        "safety_opinion": "text",
+        "legal_opinion": "text",
+        "proposed_new_rule": {
+            "concept": "Short Name (e.g. 3rd Party Data)",
+            "action": "The required process (e.g. Vendor Security Review)",
+            "owner": "Team Name",
+            "keywords": ["phrase a PRD would contain", "..."]
+        }
+    }
+}
+"""
+
+# --- RESPONSE SCHEMAS ---
+# Passed as OpenRouter response_format so the model emits bare, parseable JSON.
+SCAN_SCHEMA = {
+    "name": "scan",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "checklist": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "rule_id": {"type": "string"},
+                        "triggered": {"type": "boolean"},
+                        "reason": {"type": "string"}
+                    },
+                    "required": ["rule_id", "triggered", "reason"],
+                    "additionalProperties": False
+                }
+            },
+            "ambiguity_score": {"type": "integer"},
+            "ambiguity_reason": {"type": "string"},
+            "risk_level": {"type": "string", "enum": ["Low", "Medium", "High"]}
+        },
+        "required": ["checklist", "ambiguity_score", "ambiguity_reason", "risk_level"],
+        "additionalProperties": False
+    }
+}
+
+COUNCIL_SCHEMA = {
+    "name": "council",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "safety_opinion": {"type": "string"},
+            "legal_opinion": {"type": "string"},
+            "proposed_new_rule": {
+                "type": "object",
+                "properties": {
+                    "concept": {"type": "string"},
+                    "action": {"type": "string"},
+                    "owner": {"type": "string"},
+                    "keywords": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["concept", "action", "owner", "keywords"],
+                "additionalProperties": False
+            }
+        },
+        "required": ["safety_opinion", "legal_opinion", "proposed_new_rule"],
+        "additionalProperties": False
+    }
+}
+
+COMBINED_SCHEMA = {
+    "name": "scan_and_council",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "scan": SCAN_SCHEMA["schema"],
+            "council": {"anyOf": [COUNCIL_SCHEMA["schema"], {"type": "null"}]}
+        },
+        "required": ["scan", "council"],
+        "additionalProperties": False
+    }
+}
+
+# Risk vocabulary: the single list of signals that a PRD probably carries a risk the
+# constitution doesn't cover. It gates the speculative council call and stops the
+# local prefilter from answering without the model. Grouped by risk category, not by
+# any particular PRD; terms are matched case-insensitively from a word start, so
+# stems ("diagnos", "surveil") cover their inflections.
+NOVEL_RISK_VOCABULARY = {
+    "Data resale / sharing": [
+        "data broker", "sell the data", "sell user", "sell their", "resell", "monetize user data",
+        "share with advertisers", "advertisers", "browsing history", "ad targeting"
+    ],
+    "Biometrics / face & body data": [
+        "biometric", "face", "facial", "fingerprint", "voiceprint", "iris", "retina", "gait"
+    ],
+    "Location & surveillance": [
+        "precise location", "location tracking", "geolocation", "surveil", "track users", "monitor employees"
+    ],
+    "Financial advice & decisions": [
+        "investment advice", "financial advice", "tax advice", "stock trad", "trading", "portfolio",
+        "credit scor", "loan", "lending", "insurance underwriting"
+    ],
+    "Health": [
+        "medical", "health", "diagnos", "symptom", "prescri", "dosage", "mental health", "patient"
+    ],
+    "Minors": [
+        "children", "child", "minors", "under 13", "under 18", "teen", "kids", "coppa"
+    ],
+    "Safety-critical professional advice": [
+        "legal advice", "engineering calculation", "load calculation", "building code",
+        "safety-critical", "autonomous", "weapon", "physical safety"
+    ],
+    "Automated decisions about people": [
+        "hiring", "employment decision", "eligibility", "background check", "tenant screening"
+    ]
+}
+NOVEL_KWS = [kw for terms in NOVEL_RISK_VOCABULARY.values() for kw in terms]
+# One alternation instead of N substring scans. Leading \b only, so stems like "diagnos" still match.
+NOVEL_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, NOVEL_KWS)) + r")", re.IGNORECASE)
 
 # --- AUTHENTICATION ---
 # This is crucial for Streamlit Cloud. We check secrets first.
@@ -24,15 +235,68 @@ else:
         auth_status = "⚠️ Waiting for Key..."
 
 # --- STATE MANAGEMENT ---
-if 'constitution' not in st.session_state:
+@st.cache_data(show_spinner=False)
+def _load_baseline_rules():
+    with open('baseline_rules.json', 'rb') as f:
+        return orjson.loads(f.read())
+
+@st.cache_resource
+def _db():
+    """The System of Record: one WAL-mode SQLite connection shared by every session."""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rules(id TEXT PRIMARY KEY, concept TEXT, action TEXT, owner TEXT, keywords TEXT)"
+    )
+    return conn
+
+@st.cache_data(ttl=5, show_spinner=False)
+def load_constitution():
+    rows = _db().execute("SELECT id, concept, action, owner, keywords FROM rules ORDER BY rowid").fetchall()
+    rules = []
+    for rule_id, concept, action, owner, keywords in rows:
+        rule = {"id": rule_id, "concept": concept, "action": action, "owner": owner}
+        if keywords:
+            rule["keywords"] = orjson.loads(keywords)
+        rules.append(rule)
+    return rules
+
+def add_rule(concept, action, owner, keywords):
+    # Every rule gets keywords so local_prefilter can still rule it out; the concept
+    # itself is the fallback phrase if none were given
+    keywords = [k.strip() for k in keywords if k.strip()] or [concept]
+    # Single statement so concurrent sessions can't mint the same id
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO rules(id, concept, action, owner, keywords) "
+            "SELECT printf('RULE-%03d', COUNT(*) + 1), ?, ?, ?, ? FROM rules",
+            (concept, action, owner, orjson.dumps(keywords).decode())
+        )
+    load_constitution.clear()
+
+# Seed an empty database from the baseline file
+if _db().execute("SELECT 1 FROM rules LIMIT 1").fetchone() is None:
     try:
-        with open('baseline_rules.json', 'r') as f:
-            st.session_state.constitution = json.load(f)
+        seed_rules = _load_baseline_rules()
     except FileNotFoundError:
         st.error("⚠️ baseline_rules.json not found! Using fallback rules.")
-        st.session_state.constitution = [
+        seed_rules = [
             {"id": "R1", "concept": "PII Data", "action": "Mandatory Privacy Legal Review", "owner": "Legal"}
         ]
+    with _db() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO rules(id, concept, action, owner, keywords) VALUES (?, ?, ?, ?, ?)",
+            [(r['id'], r['concept'], r['action'], r['owner'],
+              orjson.dumps(r['keywords']).decode() if r.get('keywords') else None) for r in seed_rules]
+        )
+    load_constitution.clear()
+
+# Re-read every rerun (cached for 5s) so rules committed in other sessions show up
+st.session_state.constitution = load_constitution()
+
+# O(1) rule lookup for the checklist; rebuilt whenever the (append-only) constitution grows
+if len(st.session_state.get('constitution_index', {})) != len(st.session_state.constitution):
+    st.session_state.constitution_index = {r['id']: r for r in st.session_state.constitution}
 
 if 'scan_results' not in st.session_state:
     st.session_state.scan_results = None
@@ -40,42 +304,468 @@ if 'scan_results' not in st.session_state:
 if 'council_feedback' not in st.session_state:
     st.session_state.council_feedback = None
 
+if 'council_feedback_pending' not in st.session_state:
+    st.session_state.council_feedback_pending = None
+
 # --- HELPER FUNCTIONS ---
-def call_llm(prompt, system_prompt, key):
-    headers = {
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://launch-governance-prototype.streamlit.app/", 
-        "X-Title": "Launch Governance Prototype"
-    }
+# Every cache keyed on the constitution uses this, so they all agree on when it changed.
+# Rules are append-only (ids never change meaning), so the id sequence is enough.
+_RULES_HASH = {list: lambda L: tuple(r['id'] for r in L)}
+
+@st.cache_resource
+def _http_session():
+    """One keep-alive session per process so scan + council reuse the warm TLS connection."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.headers.update(_STATIC_HEADERS)
+    atexit.register(session.close)
+    return session
+
+class TruncatedResponseError(ValueError):
+    """The model stopped at max_tokens, so its JSON is incomplete."""
+
+def scan_max_tokens(n_rules):
+    return SCAN_BASE_TOKENS + SCAN_TOKENS_PER_RULE * n_rules
+
+def _post_chat(prompt, system_prompt, key, cached_context=None, schema=None, on_delta=None, max_tokens=800, stop=None):
+    """POST to OpenRouter with SSE streaming; on_delta gets each text chunk as it arrives."""
+    headers = {"Authorization": f"Bearer {key}"}
+    system_content = system_prompt
+    if cached_context:
+        # Anthropic content blocks: everything up to the cache_control marker is
+        # eligible for caching. Anthropic ignores the marker for prefixes under its
+        # minimum (1,024 tokens on Sonnet), and the baseline instructions + rules
+        # are only ~450 tokens, so this has no effect until the constitution grows
+        # past that; it costs nothing when the prefix is too short.
+        system_content = [
+            {"type": "text", "text": system_prompt},
+            {"type": "text", "text": cached_context, "cache_control": {"type": "ephemeral"}}
+        ]
     data = {
         "model": MODEL_SLUG, 
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": system_content},
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.1
+        "temperature": TEMPERATURE,
+        "stream": True,
+        "max_tokens": max_tokens
     }
-    try:
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
+    if stop:
+        data["stop"] = stop
+    if schema:
+        data["response_format"] = {"type": "json_schema", "json_schema": schema}
+    # Pre-encoded with orjson; requests sends the bytes as-is (Content-Type comes from the session)
+    parts = []
+    finish_reason = None
+    with _http_session().post("https://openrouter.ai/api/v1/chat/completions", headers=headers, data=orjson.dumps(data), timeout=60, stream=True) as response:
         response.raise_for_status() 
-        return response.json()['choices'][0]['message']['content']
+        for line in response.iter_lines():
+            # SSE frames look like "data: {...}"; blank lines and ": keep-alive" comments are skipped
+            if not line.startswith(b"data: "):
+                continue
+            payload = line[6:]
+            if payload == b"[DONE]":
+                break
+            chunk = orjson.loads(payload)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"].get("message", "Stream error"))
+            if not chunk.get("choices"):
+                continue
+            finish_reason = chunk["choices"][0].get("finish_reason") or finish_reason
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+    if finish_reason == "length":
+        raise TruncatedResponseError(f"Response hit the {max_tokens}-token output cap")
+    return "".join(parts)
+
+def call_llm(prompt, system_prompt, key, cached_context=None, schema=None, on_delta=None, max_tokens=800, stop=None):
+    try:
+        return _post_chat(prompt, system_prompt, key, cached_context, schema, on_delta, max_tokens, stop)
+    except TruncatedResponseError:
+        raise # Reported by the caller; not a connection problem
     except Exception as e:
         st.error(f"Debug Error: {str(e)}") # This will print the real API error to the screen
         return None
 
 def extract_json(text):
-    """Robust JSON extractor for LLM responses"""
+    """Robust JSON extractor for LLM responses: parses the first balanced {...} object"""
+    text = text.strip() if text else ""
+    if not text:
+        return None
+    # Fast path: the model already returned bare JSON
+    if text[0] == '{' and text[-1] == '}':
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        in_str = False
+        escaped = False
+        end = None
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_str:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_str = False
+            elif ch == '"':
+                in_str = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    end = i
+                    break
+        if end is None:
+            return None # Ran off the end: truncated object
+        try:
+            return orjson.loads(text[start:end + 1])
+        except orjson.JSONDecodeError:
+            # Resume after this object, never inside it, so a nested dict can't
+            # masquerade as the response (and junk input stays a single pass)
+            start = text.find('{', end + 1)
+    return None
+
+def parse_llm_json(raw):
     try:
-        start = text.find('{')
-        end = text.rfind('}') + 1
-        if start != -1 and end != -1:
-            json_str = text[start:end]
-            return json.loads(json_str)
+        data = orjson.loads(raw) # response_format guarantees bare JSON
+    except orjson.JSONDecodeError:
+        return extract_json(raw) # Provider ignored the schema; dig the object out
+    # Every response shape is an object; a bare list/number/string means the schema was ignored
+    return data if isinstance(data, dict) else None
+
+class ResponseCache:
+    """Process-wide TTL + LRU map of parsed LLM responses.
+
+    Used instead of st.cache_data because the streamed preview draws into a
+    placeholder created outside the call, which cached functions can't replay.
+    """
+    def __init__(self, ttl=3600, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            hit = self._entries.get(cache_key)
+            if hit is None:
+                return None
+            expires_at, value = hit
+            if expires_at < time.monotonic():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return value
+
+    def put(self, cache_key, value):
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def _response_cache():
+    return ResponseCache(ttl=3600, max_entries=256)
+
+@st.cache_resource
+def _inflight():
+    """Process-wide {cache_key: Future} for calls currently on the wire, plus its lock."""
+    return {}, threading.Lock()
+
+def llm_cache_key(prompt, system_prompt, key, cached_context=None, schema=None, max_tokens=800, stop=None):
+    # Includes a fingerprint of the API key so results stay per-user without storing the key
+    return hashlib.sha256(orjson.dumps(
+        [MODEL_SLUG, TEMPERATURE, max_tokens, stop, key_fingerprint(key), system_prompt, cached_context, prompt, schema]
+    )).hexdigest()
+
+def cached_call_llm(prompt, system_prompt, key, cached_context=None, schema=None, on_delta=None, max_tokens=800, stop=None):
+    """Memoised call_llm: identical model + prompts + temperature skip the network."""
+    cache_key = llm_cache_key(prompt, system_prompt, key, cached_context, schema, max_tokens, stop)
+    return _memoised_call(
+        cache_key, lambda: call_llm(prompt, system_prompt, key, cached_context, schema, on_delta, max_tokens, stop)
+    )
+
+def _memoised_call(cache_key, fetch):
+    """Response cache + in-flight coalescing around one raw LLM fetch; returns (raw, data).
+
+    fetch returns the raw text or None on failure. Failures raise so they are never
+    cached. Identical calls already in flight (double-click, second tab, the
+    speculative council) wait on the first one's Future instead of issuing their own.
+    """
+    hit = _response_cache().get(cache_key)
+    if hit:
+        return hit
+
+    inflight, lock = _inflight()
+    with lock:
+        # Re-check under the lock: an owner may have finished (put + pop) since the miss above
+        hit = _response_cache().get(cache_key)
+        if hit:
+            return hit
+        future = inflight.get(cache_key)
+        is_owner = future is None
+        if is_owner:
+            future = inflight[cache_key] = Future()
+    if not is_owner:
+        return future.result()
+
+    # The owner runs the call on its own thread so the streamed preview still renders
+    try:
+        raw = fetch()
+        if not raw:
+            raise ConnectionError("LLM call failed")
+        data = parse_llm_json(raw)
+        if data is None:
+            raise ValueError("LLM response was not valid JSON")
+        _response_cache().put(cache_key, (raw, data))
+        future.set_result((raw, data))
+        return raw, data
+    except BaseException as e:
+        # Streamlit stops a superseded script with a BaseException; waiters just see a failed call
+        future.set_exception(e if isinstance(e, Exception) else ConnectionError("LLM call was cancelled"))
+        raise
+    finally:
+        with lock:
+            inflight.pop(cache_key, None)
+
+def rules_context(rules_str):
+    return f"Strict Governance Rules: {rules_str}"
+
+def key_fingerprint(key):
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+@st.cache_resource
+def _executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+def looks_novel(prd):
+    return NOVEL_RE.search(prd) is not None
+
+def _rule_terms(rule):
+    # Explicit 'keywords' if the rule has them, else any acronym in its concept, e.g. "(PII)"
+    return rule.get('keywords') or re.findall(r"\(([^)]+)\)", rule['concept'])
+
+@st.cache_resource(show_spinner=False, hash_funcs=_RULES_HASH)
+def _keyword_matcher(constitution):
+    """One alternation regex over every rule's terms, plus a {term: [rule_id]} map to group hits."""
+    term_rules = {}
+    for rule in constitution:
+        for term in _rule_terms(rule):
+            term_rules.setdefault(term.lower(), []).append(rule['id'])
+    if not term_rules:
+        return None, term_rules
+    # Longest first so "third party" isn't shadowed by a shorter overlapping term
+    terms = sorted(term_rules, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\b", re.IGNORECASE), term_rules
+
+# Negation cue earlier in the same clause, e.g. "does not collect any PII"
+_NEGATION_RE = re.compile(r"\b(?:no|not|never|without|none|neither|nor|cannot|\w+n't)\b", re.IGNORECASE)
+
+def _is_negated(text, pos):
+    clause_start = max(text.rfind(c, 0, pos) for c in ".!?;\n") + 1
+    return _NEGATION_RE.search(text, clause_start, pos) is not None
+
+# Sentence punctuation plus coordinating conjunctions: "collect emails and sell them" is two claims
+_CLAUSE_RE = re.compile(r"[.!?;:,\n]+|\s+(?:and|but|or|while|then|so|plus)\s+", re.IGNORECASE)
+
+def local_prefilter(prd, constitution):
+    """Answer the scan locally only when keyword rules explain the entire PRD; None means ask the LLM.
+
+    Every clause must contain a non-negated rule keyword, no novel-risk term may fire,
+    and every rule must either match or have explicit keywords (so a miss is a
+    confident "not triggered"). Any clause no rule explains could hold a novel risk,
+    and judging that is the model's job.
+    """
+    if looks_novel(prd):
         return None
-    except:
+    pattern, term_rules = _keyword_matcher(constitution)
+    if pattern is None:
+        return None
+    hits = {}
+    for clause in _CLAUSE_RE.split(prd):
+        if not any(ch.isalnum() for ch in clause):
+            continue # Markdown rules, bullets, stray punctuation
+        matches = list(pattern.finditer(clause))
+        if not matches:
+            return None # Something here isn't covered by any rule
+        for match in matches:
+            if _is_negated(clause, match.start()):
+                return None # "No PII", "without payments": let the model read it
+            for rule_id in term_rules[match.group(0).lower()]:
+                hits.setdefault(rule_id, match.group(0))
+    if not hits:
+        return None
+    checklist = []
+    owners = set()
+    for rule in constitution:
+        hit = hits.get(rule['id'])
+        if hit is None and not rule.get('keywords'):
+            return None # Can't rule this one out without the model
+        checklist.append({
+            "rule_id": rule['id'],
+            "triggered": hit is not None,
+            "reason": f"PRD mentions '{hit}'." if hit else "No matching keywords."
+        })
+        if hit:
+            owners.add(rule['owner'])
+    return {
+        "checklist": checklist,
+        "ambiguity_score": 1, # Bottom of the scanner's 1-10 scale
+        "ambiguity_reason": "All rules resolved by local keyword match; no novel risk signals.",
+        "risk_level": "Medium" if len(owners) == 1 else "High"
+    }
+
+def _council_cache_key(prd, key):
+    # Must match the council button's cached_call_llm arguments so both share one entry
+    return llm_cache_key(prd, COUNCIL_INSTRUCTIONS, key, schema=COUNCIL_SCHEMA, max_tokens=COUNCIL_MAX_TOKENS)
+
+def _council_request(prd, key):
+    # Runs off the script thread, so no st.* calls here; a failure just means no speculation
+    def fetch():
+        try:
+            return _post_chat(prd, COUNCIL_INSTRUCTIONS, key, schema=COUNCIL_SCHEMA, max_tokens=COUNCIL_MAX_TOKENS)
+        except Exception:
+            return None
+    try:
+        _, data = _memoised_call(_council_cache_key(prd, key), fetch)
+        return data
+    except Exception:
         return None
 
+def run_scan_and_maybe_council(prd, rules_str, key, on_delta=None):
+    """Run the governance scan, speculatively starting the council call alongside it.
+
+    The council Future is parked in session state so the council button can reveal
+    it without a second round trip; it is simply dropped if the user never asks.
+    A cached council result is parked as an already-finished Future.
+    """
+    st.session_state.council_feedback_pending = None
+    if looks_novel(prd):
+        hit = _response_cache().get(_council_cache_key(prd, key))
+        if hit:
+            future = Future()
+            future.set_result(hit[1])
+        else:
+            future = _executor().submit(_council_request, prd, key)
+        st.session_state.council_feedback_pending = {"prd": prd, "future": future}
+    _, data = cached_call_llm(prd, SCANNER_INSTRUCTIONS, key, rules_context(rules_str), SCAN_SCHEMA, on_delta,
+                              scan_max_tokens(len(st.session_state.constitution)))
+    return data
+
+def run_combined_scan(prd, rules_str, key, on_delta=None):
+    """Fast mode: one round trip returning both the scan and (if ambiguous) the council.
+
+    Raises ValueError when the response doesn't have the combined shape, so the
+    caller can fall back to the two-call flow.
+    """
+    _, data = cached_call_llm(prd, COMBINED_INSTRUCTIONS, key, rules_context(rules_str), COMBINED_SCHEMA, on_delta,
+                              scan_max_tokens(len(st.session_state.constitution)) + COUNCIL_MAX_TOKENS)
+    scan, council = data.get("scan"), data.get("council")
+    if not isinstance(scan, dict) or "checklist" not in scan:
+        raise ValueError("Combined response is missing the scan object")
+    if council is not None and not isinstance(council, dict):
+        raise ValueError("Combined response has a malformed council object")
+    return scan, council
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+EMBED_DIM = 2048 # Wide enough that hash collisions between unrelated words are rare
+# Sentences scoring at or below this against every rule are never kept for relevance alone
+MIN_RULE_SIMILARITY = 0.1
+_STOPWORDS = frozenset("""
+a an the of and or to in on for with by from at as is are was were be been being this that these
+those it its we our you your they their them he she his her will can may must should would could
+not no into about over per via each any all than then so if but also has have had do does
+""".split())
+
+def estimate_tokens(text):
+    return len(text) // 4 # ~4 chars/token for English prose; only used to decide whether to compress
+
+def _bag_of_words(texts):
+    """Hashed word counts (stopwords and bare numbers dropped): a dependency-free stand-in for sentence embeddings."""
+    vecs = np.zeros((len(texts), EMBED_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in _WORD_RE.findall(text.lower()):
+            if word not in _STOPWORDS and not word.isdigit():
+                vecs[i, zlib.crc32(word.encode()) % EMBED_DIM] += 1.0
+    return vecs
+
+def _normalise(vecs):
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-9)
+
+def embed_texts(texts):
+    return _normalise(_bag_of_words(texts))
+
+def cos_topk(S, R, k):
+    """Top-k rows of S for each row of R by cosine similarity.
+
+    S and R are L2-normalised float32, so a single matmul yields every cosine and
+    argpartition picks each column's top k without a full sort. Returns the
+    (k, n_rules) row indices and their similarities.
+    """
+    M = S @ R.T
+    k = min(k, M.shape[0])
+    top = np.argpartition(-M, k - 1, axis=0)[:k]
+    return top, np.take_along_axis(M, top, axis=0)
+
+@st.cache_data(show_spinner=False, hash_funcs=_RULES_HASH)
+def _rule_vectors(constitution):
+    return embed_texts([" ".join([r['concept'], *_rule_terms(r)]) for r in constitution])
+
+@st.cache_data(show_spinner=False, hash_funcs=_RULES_HASH)
+def compress_prd(prd, constitution, top_k=5, header_chars=800):
+    """Shrink long PRDs to a header plus the sentences closest to each rule.
+
+    Sentences that trip NOVEL_RE are always kept verbatim, since those are exactly
+    the risks the rules don't describe. Short PRDs are returned unchanged.
+    """
+    if estimate_tokens(prd) <= PRD_TOKEN_BUDGET or not constitution:
+        return prd
+    cut = prd.rfind("\n", 0, header_chars)
+    cut = cut if cut > 0 else header_chars
+    header, body = prd[:cut], prd[cut:]
+    sentences = [s.strip() for s in _SENTENCE_RE.split(body) if s.strip()]
+    if not sentences:
+        return prd
+    S = _bag_of_words(sentences)
+    # Rarity weighting over the PRD's own sentences: a word present in every sentence
+    # (boilerplate like "number") weighs 0, so it can't drive the ranking
+    df = np.count_nonzero(S, axis=0)
+    S *= np.log((1 + len(sentences)) / (1 + df)).astype(np.float32)
+    top, top_sims = cos_topk(_normalise(S), _rule_vectors(constitution), top_k)
+    keep = set(top[top_sims > MIN_RULE_SIMILARITY].tolist())
+    keep.update(i for i, sentence in enumerate(sentences) if NOVEL_RE.search(sentence))
+    return header + "\n\n[... condensed for review ...]\n\n" + "\n".join(sentences[i] for i in sorted(keep))
+
+@st.cache_data(show_spinner=False, hash_funcs=_RULES_HASH)
+def serialize_rules(rules):
+    return orjson.dumps(rules).decode()
+
+@st.cache_data(show_spinner=False, hash_funcs=_RULES_HASH)
+def constitution_markdown(rules):
+    # One markdown element for the whole sidebar list instead of an expander per rule.
+    # Rule text can come from the council, so it's escaped before going into raw HTML.
+    return "\n".join(
+        f"<details><summary>🔐 {html.escape(r['owner'])}: {html.escape(r['concept'])}</summary>\n\n"
+        f"**Action:** {html.escape(r['action'])}\n\n</details>"
+        for r in rules
+    )
+
+@st.cache_data(show_spinner=False)
 def load_default_prd():
     try:
         with open('risky_prd.txt', 'r') as f:
@@ -104,14 +794,13 @@ st.divider()
 with st.sidebar:
     st.header("⚙️ System of Record")
     st.caption(f"Status: {auth_status}")
+    st.toggle("⚡ Fast mode (scan + council in one call)", value=True, key="fast_mode")
     
     st.divider()
     st.subheader("📜 Active Policy Guardrails")
     st.info("These rules are dynamically applied to every launch.")
     
-    for rule in st.session_state.constitution:
-        with st.expander(f"🔐 {rule['owner']}: {rule['concept']}"):
-            st.write(f"**Action:** {rule['action']}")
+    st.markdown(constitution_markdown(st.session_state.constitution), unsafe_allow_html=True)
 
 # MAIN AREA
 col1, col2 = st.columns([1, 1])
@@ -131,40 +820,44 @@ with col1:
     if st.button("🔍 Run Governance Scan", type="primary", disabled=not api_key):
         with st.spinner("🕵️‍♀️ Consulting the Constitution & Analyzing Risk..."):
             
-            # 1. Prepare Rules Context
-            rules_str = json.dumps(st.session_state.constitution)
-            
-            # 2. System Prompt for The Scanner
-            sys_prompt = f"""
-            You are the Anthropic Governance Engine. 
-            Compare the Input PRD against the following Strict Governance Rules: {rules_str}
-            
-            Task:
-            1. Check if any existing rules are triggered.
-            2. DETECT NOVEL RISKS: Look for risks that are NOT covered by existing rules (e.g., 3rd party data sharing, biometrics, etc).
-            3. Assign an 'ambiguity_score' (1-10). 10 = Highly risky/novel with NO matching rule.
+            # 1. Prepare Rules Context (sent as a separate, cacheable system block)
+            rules_str = serialize_rules(st.session_state.constitution)
             
-            Output strictly valid JSON:
-            {{
-                "checklist": [
-                    {{ "rule_id": "RULE-XXX", "triggered": true, "reason": "Explanation" }}
-                ],
-                "ambiguity_score": int,
-                "ambiguity_reason": "Explanation of the novel risk",
-                "risk_level": "Low" | "Medium" | "High"
-            }}
-            """
+            # 2. Live preview of the streamed response (time-to-first-token, not total time)
+            preview = st.empty()
+            streamed = []
+            def show_progress(delta):
+                streamed.append(delta)
+                preview.code("".join(streamed), language="json")
             
-            raw_res = call_llm(prd_text, sys_prompt, api_key)
-            if raw_res:
-                data = extract_json(raw_res)
-                if data:
-                    st.session_state.scan_results = data
-                    st.session_state.council_feedback = None # Reset downstream state
+            try:
+                data, council = local_prefilter(prd_text, st.session_state.constitution), None
+                if data is not None:
+                    st.session_state.council_feedback_pending = None
+                    st.toast("⚡ Resolved by local rule match. No LLM call needed.")
                 else:
-                    st.error("Failed to parse Governance response.")
-            else:
+                    # 3. Long PRDs go to the model as an extractive summary (the prefilter saw it all)
+                    llm_prd = compress_prd(prd_text, st.session_state.constitution)
+                    if llm_prd != prd_text:
+                        st.caption(f"✂️ Long PRD: sending a ~{estimate_tokens(llm_prd)}-token summary to the model.")
+                    if st.session_state.get("fast_mode", True):
+                        try:
+                            data, council = run_combined_scan(llm_prd, rules_str, api_key, show_progress)
+                            st.session_state.council_feedback_pending = None
+                        except ValueError:
+                            pass # Combined response malformed or truncated: fall back to two-call mode
+                    if data is None:
+                        streamed.clear()
+                        data = run_scan_and_maybe_council(llm_prd, rules_str, api_key, show_progress)
+                st.session_state.scan_results = data
+                st.session_state.council_feedback = council # Reset downstream state
+            except ConnectionError:
                 st.error("Connection Error or Invalid Key")
+            except TruncatedResponseError as e:
+                st.error(f"Governance response was cut off: {e}. Try again or shorten the PRD.")
+            except ValueError:
+                st.error("Failed to parse Governance response.")
+            preview.empty()
 
 with col2:
     st.subheader("2. Launch Readiness")
@@ -187,7 +880,7 @@ with col2:
         
         for item in triggered_rules:
             # Find the rule details
-            rule_def = next((r for r in st.session_state.constitution if r['id'] == item['rule_id']), None)
+            rule_def = st.session_state.constitution_index.get(item['rule_id'])
             if rule_def:
                 st.error(f"**STOP: {rule_def['owner']} Review Required**")
                 st.markdown(f"**Trigger:** {rule_def['concept']}")
@@ -205,27 +898,20 @@ with col2:
             
             if st.button("⚡ Trigger Synthetic Stakeholder Review (Safety + Legal)"):
                 with st.spinner("Simulating debate between Safety, Legal, and Security..."):
-                    council_prompt = """
-                    You are a Synthetic Stakeholder Council (Safety, Legal, Security).
-                    The user is proposing a feature with a NOVEL RISK that is not in our Constitution.
-                    
-                    1. Analyze the risk.
-                    2. PROPOSE A NEW PERMANENT RULE for the Constitution to handle this in the future.
-                    
-                    Output JSON:
-                    {
-                        "safety_opinion": "text",
-                        "legal_opinion": "text",
-                        "proposed_new_rule": {
-                            "concept": "Short Name (e.g. 3rd Party Data)",
-                            "action": "The required process (e.g. Vendor Security Review)",
-                            "owner": "Team Name"
-                        }
-                    }
-                    """
-                    raw_council = call_llm(prd_text, council_prompt, api_key)
-                    if raw_council:
-                        c_data = extract_json(raw_council)
+                    c_data = None
+                    llm_prd = compress_prd(prd_text, st.session_state.constitution)
+                    pending = st.session_state.council_feedback_pending
+                    if pending and pending["prd"] == llm_prd:
+                        # Speculative call started with the scan; usually already done
+                        c_data = pending["future"].result()
+                    if not c_data:
+                        try:
+                            _, c_data = cached_call_llm(llm_prd, COUNCIL_INSTRUCTIONS, api_key, schema=COUNCIL_SCHEMA, max_tokens=COUNCIL_MAX_TOKENS)
+                        except TruncatedResponseError as e:
+                            st.error(f"Council response was cut off: {e}.")
+                        except (ConnectionError, ValueError):
+                            pass
+                    if c_data:
                         st.session_state.council_feedback = c_data
 
     # EVOLUTION STEP
@@ -247,15 +933,16 @@ with col2:
             c_concept = st.text_input("New Rule Trigger", value=new_rule.get('concept'))
             c_owner = st.text_input("Owner", value=new_rule.get('owner'))
             c_action = st.text_input("Required Action", value=new_rule.get('action'))
+            c_keywords = st.text_input(
+                "Trigger Keywords (comma-separated)",
+                value=", ".join(new_rule.get('keywords') or []),
+                help="Phrases that mark a PRD as covered by this rule during the local pre-scan."
+            )
             
             if st.form_submit_button("Commit New Rule to Constitution"):
-                # Add to session state
-                st.session_state.constitution.append({
-                    "id": f"RULE-{len(st.session_state.constitution)+1:03d}",
-                    "concept": c_concept,
-                    "action": c_action,
-                    "owner": c_owner
-                })
+                # Persist to the System of Record
+                add_rule(c_concept, c_action, c_owner, c_keywords.split(","))
+                del st.session_state.constitution_index # Rebuilt on the rerun below
                 st.balloons()
                 st.success("Constitution Updated! This logic is now part of the operating system.")
                 time.sleep(2)